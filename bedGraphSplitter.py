@@ -53,12 +53,21 @@ logging.basicConfig(format='%(levelname)s: %(message)s')
 # No classes defined
 
 #######################################################################
-# Main program
+# Functions
 #######################################################################
 
-if __name__ == "__main__":
+def main(argv):
+    """Run bedGraphSplitter with the supplied command line
 
-    p = optparse.OptionParser(usage="%prog [options] <file>",
+    Arguments:
+      argv: list of command line arguments, with the program name
+        as the first element (i.e. as for sys.argv)
+
+    Returns:
+      Exit status (zero for success, non-zero for failure).
+    """
+    p = optparse.OptionParser(prog=os.path.basename(argv[0]),
+                              usage="%prog [options] <file>",
                               version="%prog "+__version__,
                               description=
                               "Generate bedGraph custom track files for display in UCSC "
@@ -86,7 +95,7 @@ if __name__ == "__main__":
                  "(default is not to write a header)")
 
     # Process the command line
-    options,arguments = p.parse_args()
+    options,arguments = p.parse_args(argv[1:])
 
     # Input file
     if len(arguments) != 1:
@@ -94,7 +103,7 @@ if __name__ == "__main__":
     filen = arguments[0]
     if not os.path.exists(filen):
         logging.error("Input file '%s' not found" % filen)
-        sys.exit(1)
+        return 1
 
     # Report version
     p.print_version()
@@ -122,7 +131,7 @@ if __name__ == "__main__":
     # Selected columns
     if len(user_selected) == 0:
         print "No columns selected for output."
-        sys.exit()
+        return 0
     print "Selected columns = %s" % ' '.join(user_selected)
     # Assume user counts columns starting from one and adjust to count from zero
     # Also check that the requested column exists and set up file names based on
@@ -135,12 +144,12 @@ if __name__ == "__main__":
             col0 = int(col) - 1
             if col0 >= data.nColumns():
                 logging.error("Unable to find column %s, not enough columns in input file" % col)
-                sys.exit(1)
+                return 1
         except ValueError:
             # Not an integer
             if col not in data.header():
                 logging.error("Unable to find column '%s' in input file" % col)
-                sys.exit(1)
+                return 1
             col0 = data.header().index(col)
         # Column lookup
         col_lookup[col0] = col
@@ -193,5 +202,11 @@ if __name__ == "__main__":
         out_file[col].close()
 
     print "Finished"
-    sys.exit()
+    return 0
+
+#######################################################################
+# Main program
+#######################################################################
 
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
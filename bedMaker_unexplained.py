@@ -90,13 +90,18 @@ def computeRGBUnexplained(length,average_coverage):
         RGB = '139,0,0'
     return RGB
 
-#######################################################################
-# Main program
-#######################################################################
+def main(argv):
+    """Run bedMaker_unexplained with the supplied command line
 
-if __name__ == "__main__":
+    Arguments:
+      argv: list of command line arguments, with the program name
+        as the first element (i.e. as for sys.argv)
 
-    p = optparse.OptionParser(usage="%prog <input_file>",
+    Returns:
+      Exit status (zero for success, non-zero for failure).
+    """
+    p = optparse.OptionParser(prog=os.path.basename(argv[0]),
+                              usage="%prog <input_file>",
                               version="%prog "+__version__,
                               description=
                               "Create a BED format file from an input tab file with columns "
@@ -104,7 +109,7 @@ if __name__ == "__main__":
                               "average_coverage.")
 
     # Process the command line
-    options,arguments = p.parse_args()
+    options,arguments = p.parse_args(argv[1:])
     if len(arguments) != 1:
         p.error("No input file supplied")
 
@@ -112,7 +117,7 @@ if __name__ == "__main__":
     infile = arguments[0]
     if not os.path.exists(infile):
         logging.error("Input file '%s' not found" % infile)
-        sys.exit(1)
+        return 1
 
     # Report version
     p.print_version()
@@ -155,3 +160,11 @@ if __name__ == "__main__":
                                                                         'strand','start','stop',
                                                                         'RGB'))
     print "Finished"
+    return 0
+
+#######################################################################
+# Main program
+#######################################################################
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,351 @@
+#!/bin/env python
+#
+#     bedUtilsClient.py: run bedUtils programs via a bedUtilsServer
+#     Copyright (C) University of Manchester 2026
+#
+########################################################################
+#
+# bedUtilsClient.py
+#
+#########################################################################
+
+"""bedUtilsClient.py
+
+Thin client for submitting conversion jobs to a running bedUtilsServer.
+
+The client takes the name of a bedUtils program followed by the same
+options and arguments that would be given to that program on the command
+line, e.g.:
+
+bedUtilsClient.py bedMaker.py myfile.txt
+
+Output from the program is relayed back as it is produced, and the client
+exits with the program's exit status. Output files are written relative to
+the client's current directory, exactly as if the program had been run
+directly.
+
+The point of the client is to avoid start up costs, so it deliberately
+only imports a minimal set of modules (in particular it doesn't use json,
+logging, optparse or socket).
+
+Protocol
+--------
+
+A job request is a single line containing a JSON object of the form:
+
+{"tool": <program name>, "args": [<arguments>], "cwd": <working directory>,
+ "reply": "json"|"raw"}
+
+Strings are ordinary UTF-8 text. Paths and arguments are byte strings
+which aren't necessarily valid UTF-8, so any bytes which can't be decoded
+are sent as the characters U+DC80 to U+DCFF (the same convention as
+Python 3's 'surrogateescape' error handler and os.fsdecode).
+
+The server's replies are a sequence of messages with a 'type' of
+'status' (with 'message'), 'output' (with 'stream' and 'data'), 'error'
+(with 'message') and finally 'finished' (with 'exit_status' and 'stats').
+
+If 'reply' is "json" (the default) then each message is a JSON object on a
+single line, with strings encoded in the same way as for the request.
+
+If 'reply' is "raw" (used by this client) then each message is sent as a
+header line '<tag> <length>' followed by exactly <length> bytes of data.
+The tag is 'status', 'stdout', 'stderr', 'error' or 'finished'; for
+'finished' the data is a line 'exit_status <n>' followed by a
+'<name> <value>' line for each statistic.
+"""
+
+#######################################################################
+# Import modules
+#######################################################################
+
+import os
+import sys
+import stat
+import codecs
+import _socket
+import version
+__version__ = version.__version__
+
+#######################################################################
+# Classes
+#######################################################################
+
+# No classes defined
+
+#######################################################################
+# Functions
+#######################################################################
+
+def defaultSocketPath():
+    """Return the default path for the server socket
+
+    This is taken from the BEDUTILS_SOCKET environment variable if it is
+    set. Otherwise it is 'bedUtils.sock' in XDG_RUNTIME_DIR if that is set,
+    or else in a directory 'bedUtils-<uid>' in TMPDIR (or /tmp), which the
+    server creates so that only the current user can access it.
+    """
+    try:
+        return os.environ['BEDUTILS_SOCKET']
+    except KeyError:
+        pass
+    try:
+        return os.path.join(os.environ['XDG_RUNTIME_DIR'],"bedUtils.sock")
+    except KeyError:
+        return os.path.join(os.environ.get('TMPDIR','/tmp'),
+                            "bedUtils-%d" % os.getuid(),"bedUtils.sock")
+
+def checkSocket(socket_path):
+    """Check that a server socket belongs to the current user
+
+    Returns None if the socket exists and is owned by the current user,
+    otherwise a message describing the problem.
+    """
+    try:
+        st = os.stat(socket_path)
+    except OSError, ex:
+        return "Unable to contact server on '%s': %s" % (socket_path,ex.strerror)
+    if not stat.S_ISSOCK(st.st_mode):
+        return "'%s' is not a socket" % socket_path
+    if st.st_uid != os.getuid():
+        return "Socket '%s' is not owned by the current user" % socket_path
+    return None
+
+def _escapeBytes(ex):
+    """Internal: codec error handler mapping undecodable bytes to U+DCxx
+    """
+    if not isinstance(ex,UnicodeDecodeError):
+        raise ex
+    return (u''.join([unichr(0xdc00+ord(b)) for b in ex.object[ex.start:ex.end]]),
+            ex.end)
+
+codecs.register_error('bedutils-escape',_escapeBytes)
+
+def bytesToText(data):
+    """Convert a byte string to text for sending
+
+    The data is decoded as UTF-8, with any bytes which aren't valid UTF-8
+    converted to the characters U+DC80 to U+DCFF.
+    """
+    return data.decode('utf-8','bedutils-escape')
+
+def jsonString(data):
+    """Return a byte string encoded as a JSON string literal
+
+    The data is converted using bytesToText, and the result only contains
+    ASCII characters.
+    """
+    out = ['"']
+    for c in bytesToText(data):
+        n = ord(c)
+        if c == '"' or c == '\\':
+            out.append('\\'+c)
+        elif 0x20 <= n < 0x7f:
+            out.append(str(c))
+        elif n > 0xffff:
+            n -= 0x10000
+            out.append('\\u%04x\\u%04x' % (0xd800+(n >> 10),0xdc00+(n & 0x3ff)))
+        else:
+            out.append('\\u%04x' % n)
+    out.append('"')
+    return ''.join(out)
+
+def encodeRequest(tool,args,cwd,reply='raw'):
+    """Encode a job request as a single JSON line
+
+    Arguments:
+      tool: name of the program to run (e.g. 'bedMaker.py')
+      args: list of command line arguments for the program
+      cwd: directory to run the job in
+      reply: (optional) format for the replies, 'raw' (the default) or
+        'json'
+    """
+    return '{"tool": %s, "args": [%s], "cwd": %s, "reply": %s}\n' % \
+        (jsonString(tool),
+         ', '.join([jsonString(arg) for arg in args]),
+         jsonString(cwd),
+         jsonString(reply))
+
+def readReplies(sock):
+    """Iterate over 'raw' format replies read from a socket
+
+    Yields a (tag,data) tuple for each reply until the server closes the
+    connection. Raises ValueError if a reply is incomplete or badly
+    formed.
+    """
+    buf = ''
+    while True:
+        i = buf.find('\n')
+        if i < 0:
+            data = sock.recv(65536)
+            if not data:
+                if buf:
+                    raise ValueError("Incomplete reply from server")
+                return
+            buf += data
+            continue
+        header = buf[:i]
+        buf = buf[i+1:]
+        try:
+            tag,length = header.split(' ')
+            length = int(length)
+        except ValueError:
+            raise ValueError("Unexpected reply from server: %s" % header)
+        chunks = [buf]
+        size = len(buf)
+        while size < length:
+            data = sock.recv(max(65536,length - size))
+            if not data:
+                raise ValueError("Incomplete reply from server")
+            chunks.append(data)
+            size += len(data)
+        buf = ''.join(chunks)
+        yield tag,buf[:length]
+        buf = buf[length:]
+
+def submitJob(tool,args,socket_path=None,cwd=None):
+    """Submit a job to the server and iterate over the replies
+
+    Arguments:
+      tool: name of the program to run (e.g. 'bedMaker.py')
+      args: list of command line arguments for the program
+      socket_path: (optional) path to the server socket (defaults to
+        the value from defaultSocketPath)
+      cwd: (optional) directory to run the job in (defaults to the
+        current directory)
+
+    Yields a (tag,data) tuple for each reply from the server (see
+    readReplies). Raises _socket.error if the server cannot be contacted.
+    """
+    if socket_path is None:
+        socket_path = defaultSocketPath()
+    if cwd is None:
+        cwd = os.getcwd()
+    sock = _socket.socket(_socket.AF_UNIX,_socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        sock.sendall(encodeRequest(tool,args,os.path.abspath(cwd)))
+        for reply in readReplies(sock):
+            yield reply
+    finally:
+        sock.close()
+
+def error(message):
+    """Write an error message to stderr
+    """
+    sys.stderr.write("ERROR: %s\n" % message)
+
+def main(argv):
+    """Run bedUtilsClient with the supplied command line
+
+    Options are processed by hand rather than using optparse, to keep
+    start up time to a minimum.
+
+    Arguments:
+      argv: list of command line arguments, with the program name
+        as the first element (i.e. as for sys.argv)
+
+    Returns:
+      Exit status (zero for success, non-zero for failure).
+    """
+    prog = os.path.basename(argv[0])
+    usage = "Usage: %s [options] <program> [<program options>] <input_file>\n" % prog
+
+    # Process the command line
+    socket_path = None
+    stats = False
+    arguments = list(argv[1:])
+    while arguments and arguments[0].startswith('-'):
+        opt = arguments.pop(0)
+        if opt == '--':
+            break
+        elif opt == '--stats':
+            stats = True
+        elif opt == '--socket':
+            if not arguments:
+                sys.stderr.write("%s\n%s: error: --socket option requires an argument\n" %
+                                 (usage,prog))
+                return 2
+            socket_path = arguments.pop(0)
+        elif opt.startswith('--socket='):
+            socket_path = opt[len('--socket='):]
+        elif opt in ('-h','--help'):
+            sys.stdout.write(usage)
+            sys.stdout.write("""
+Run a bedUtils program (e.g. bedMaker.py or bedGraphSplitter.py) via a
+running bedUtilsServer. Options and arguments after the program name are
+passed to the program unchanged.
+
+Options:
+  --version           show program's version number and exit
+  -h, --help          show this help message and exit
+  --socket=SOCKET     path to the server socket (default '%s')
+  --stats             report job status and statistics from the server to
+                      stderr
+""" % defaultSocketPath())
+            return 0
+        elif opt == '--version':
+            sys.stdout.write("%s %s\n" % (prog,__version__))
+            return 0
+        else:
+            sys.stderr.write("%s\n%s: error: no such option: %s\n" % (usage,prog,opt))
+            return 2
+    if len(arguments) < 1:
+        sys.stderr.write("%s\n%s: error: No program supplied\n" % (usage,prog))
+        return 2
+    tool = arguments[0]
+    args = arguments[1:]
+    if socket_path is None:
+        socket_path = defaultSocketPath()
+
+    # Check the socket belongs to this user before sending anything
+    message = checkSocket(socket_path)
+    if message:
+        error(message)
+        return 1
+
+    # Submit the job and relay the replies
+    exit_status = None
+    try:
+        for tag,data in submitJob(tool,args,socket_path=socket_path):
+            if tag == 'stdout':
+                sys.stdout.write(data)
+                sys.stdout.flush()
+            elif tag == 'stderr':
+                sys.stderr.write(data)
+                sys.stderr.flush()
+            elif tag == 'status':
+                if stats:
+                    sys.stderr.write("[status] %s\n" % data)
+            elif tag == 'error':
+                error(data)
+                return 1
+            elif tag == 'finished':
+                lines = data.splitlines()
+                try:
+                    name,value = lines[0].split(' ')
+                    exit_status = int(value)
+                except (IndexError,ValueError):
+                    raise ValueError("Unexpected reply from server: %s" % data)
+                if stats:
+                    for line in lines[1:]:
+                        sys.stderr.write("[stats] %s\n" % line.replace(' ',': ',1))
+    except _socket.error, ex:
+        error("Unable to communicate with server: %s" % ex.args[-1])
+        return 1
+    except ValueError, ex:
+        error(ex)
+        return 1
+
+    # Check the job completed
+    if exit_status is None:
+        error("Connection to server closed before job finished")
+        return 1
+    return exit_status
+
+#######################################################################
+# Main program
+#######################################################################
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,613 @@
+#!/bin/env python
+#
+#     bedUtilsServer.py: run bedUtils programs from a warm worker pool
+#     Copyright (C) University of Manchester 2026
+#
+########################################################################
+#
+# bedUtilsServer.py
+#
+#########################################################################
+
+"""bedUtilsServer.py
+
+Long-running server which accepts conversion jobs over a local Unix
+socket and runs them in a pool of pre-started worker processes.
+
+When many small conversions are run, the cost of starting Python and
+importing the supporting modules for each one can exceed the cost of the
+conversion itself. The server loads the bedUtils programs once and then
+forks a fixed number of workers, each of which accepts and runs jobs one
+at a time, so this cost is only paid once.
+
+Jobs are submitted using bedUtilsClient.py, which behaves in the same way
+as running the program directly, e.g.:
+
+bedUtilsServer.py --workers 4 &
+bedUtilsClient.py bedMaker.py myfile.txt
+
+Each job is run in the client's working directory with the client's
+arguments. Output is streamed back to the client as it is produced,
+followed by the exit status and statistics for the job (elapsed and CPU
+time, and the worker's process id, job count and peak memory usage).
+
+Note that jobs run as the user who started the server, so the socket is
+created with permissions which only allow that user to connect to it.
+"""
+
+#######################################################################
+# Import modules
+#######################################################################
+
+import os
+import sys
+import re
+import time
+import stat
+import json
+import errno
+import signal
+import socket
+import logging
+import optparse
+import resource
+import traceback
+import SocketServer
+from bedUtilsClient import defaultSocketPath,bytesToText
+import bedMaker
+import bedMaker_unexplained
+import bedGraphSplitter
+import version
+__version__ = version.__version__
+
+# Set default logging level and output
+logging.basicConfig(format='%(levelname)s: %(message)s')
+
+# Programs which can be run by the server
+TOOLS = { 'bedMaker.py': bedMaker.main,
+          'bedMaker_unexplained.py': bedMaker_unexplained.main,
+          'bedGraphSplitter.py': bedGraphSplitter.main, }
+
+# Characters used to send bytes which aren't valid UTF-8
+ESCAPED_BYTES = re.compile(u'([\udc80-\udcff]+)')
+
+# Minimum time a worker must run for before it is restarted without a
+# delay, to avoid restarting workers in a tight loop if they are failing
+WORKER_RESTART_INTERVAL = 1.0
+
+#######################################################################
+# Classes
+#######################################################################
+
+class MessageStream:
+    """MessageStream
+
+    File-like object which sends text written to it to a client as
+    'output' messages.
+
+    Text is sent a line at a time; any incomplete line is held back until
+    it is completed or the stream is flushed. If the client goes away
+    then subsequent output is discarded, so that the job can still run
+    to completion.
+    """
+
+    def __init__(self,sock,name,raw=False):
+        """Create a new MessageStream instance
+
+        Arguments:
+          sock: connected socket to send messages to
+          name: name of the stream ('stdout' or 'stderr')
+          raw: (optional) if True then send 'raw' format messages
+            (default is to send JSON)
+        """
+        self.sock = sock
+        self.name = name
+        self.raw = raw
+        self.softspace = 0
+        self.__buffer = ''
+        self.__lost = False
+
+    def write(self,text):
+        """Write text to the stream
+        """
+        if isinstance(text,unicode):
+            text = text.encode('utf-8')
+        self.__buffer += text
+        if '\n' in self.__buffer:
+            i = self.__buffer.rindex('\n') + 1
+            data = self.__buffer[:i]
+            self.__buffer = self.__buffer[i:]
+            self.__send(data)
+
+    def writelines(self,lines):
+        """Write a sequence of strings to the stream
+        """
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        """Send any pending text to the client
+        """
+        if self.__buffer:
+            data = self.__buffer
+            self.__buffer = ''
+            self.__send(data)
+
+    def __send(self,data):
+        """Internal: send data as an 'output' message
+        """
+        if self.__lost:
+            return
+        try:
+            sendMessage(self.sock,{'type': 'output',
+                                   'stream': self.name,
+                                   'data': data},self.raw)
+        except socket.error:
+            self.__lost = True
+
+class JobHandler(SocketServer.StreamRequestHandler):
+    """JobHandler
+
+    Handles a single job request from a client: reads the request, runs
+    the requested program and sends back its output, exit status and
+    statistics.
+    """
+
+    def handle(self):
+        """Handle a job request
+        """
+        # Read and check the request
+        line = self.rfile.readline()
+        if not line.strip():
+            # Connection closed without a request (e.g. by a check
+            # for a running server)
+            return
+        self.raw = False
+        try:
+            request = decodeRequest(line)
+        except UnicodeDecodeError:
+            self.sendError("Job request is not valid UTF-8")
+            return
+        except ValueError:
+            self.sendError("Badly formed job request")
+            return
+        try:
+            tool = request['tool']
+            args = request.get('args',[])
+            cwd = request['cwd']
+            reply = request.get('reply','json')
+        except (KeyError,TypeError,AttributeError):
+            self.sendError("Badly formed job request")
+            return
+        if not isinstance(tool,str) or not isinstance(cwd,str) or \
+                not isinstance(args,list) or \
+                [arg for arg in args if not isinstance(arg,str)] or \
+                reply not in ('json','raw'):
+            self.sendError("Badly formed job request")
+            return
+        self.raw = (reply == 'raw')
+        tool = os.path.basename(tool)
+        if not tool.endswith('.py'):
+            tool += '.py'
+        if tool not in TOOLS:
+            self.sendError("Unknown program '%s' (must be one of %s)" %
+                           (tool,', '.join(sorted(TOOLS))))
+            return
+        if not os.path.isdir(cwd):
+            self.sendError("Working directory '%s' not found" % cwd)
+            return
+        # Run the job
+        self.server.jobs_handled += 1
+        pid = os.getpid()
+        sendMessage(self.connection,{'type': 'status',
+                                     'message': "%s started by worker %d" % (tool,pid)},
+                    self.raw)
+        start_time = time.time()
+        start_usage = resource.getrusage(resource.RUSAGE_SELF)
+        exit_status = runJob(TOOLS[tool],[tool]+args,cwd,
+                             MessageStream(self.connection,'stdout',self.raw),
+                             MessageStream(self.connection,'stderr',self.raw))
+        end_usage = resource.getrusage(resource.RUSAGE_SELF)
+        stats = { 'elapsed_time': round(time.time() - start_time,3),
+                  'user_time': round(end_usage.ru_utime - start_usage.ru_utime,3),
+                  'system_time': round(end_usage.ru_stime - start_usage.ru_stime,3),
+                  'worker_pid': pid,
+                  'worker_jobs': self.server.jobs_handled,
+                  'worker_max_rss_kb': end_usage.ru_maxrss }
+        sendMessage(self.connection,{'type': 'finished',
+                                     'exit_status': exit_status,
+                                     'stats': stats},self.raw)
+
+    def sendError(self,message):
+        """Send an 'error' message to the client
+        """
+        logging.warning(message)
+        sendMessage(self.connection,{'type': 'error','message': message},self.raw)
+
+class JobServer(SocketServer.UnixStreamServer):
+    """JobServer
+
+    Unix socket server which passes each connection to a JobHandler, and
+    keeps a count of the number of jobs handled by the process.
+    """
+
+    def __init__(self,socket_path):
+        """Create a new JobServer instance
+
+        Arguments:
+          socket_path: path of the Unix socket to listen on
+        """
+        SocketServer.UnixStreamServer.__init__(self,socket_path,JobHandler)
+        self.jobs_handled = 0
+
+    def handle_error(self,request,client_address):
+        """Report an error raised while handling a request
+        """
+        logging.error("Error handling job request (worker %d): %s" %
+                      (os.getpid(),sys.exc_info()[1]))
+
+#######################################################################
+# Functions
+#######################################################################
+
+def textToBytes(text):
+    """Convert received text back to a byte string
+
+    Reverses bytesToText: the text is encoded as UTF-8, except for the
+    characters U+DC80 to U+DCFF which are converted back to the single
+    bytes they represent.
+    """
+    parts = ESCAPED_BYTES.split(text)
+    for i in range(len(parts)):
+        if i%2:
+            parts[i] = ''.join([chr(ord(c)-0xdc00) for c in parts[i]])
+        else:
+            parts[i] = parts[i].encode('utf-8')
+    return ''.join(parts)
+
+def convertStrings(obj,convert,string_type):
+    """Apply a conversion to all strings in a (nested) object
+
+    Arguments:
+      obj: object to convert (dictionaries and lists are converted
+        recursively)
+      convert: function to apply to each string
+      string_type: type of the strings to convert (str or unicode)
+    """
+    if isinstance(obj,string_type):
+        return convert(obj)
+    elif isinstance(obj,dict):
+        return dict([(convertStrings(k,convert,string_type),
+                      convertStrings(v,convert,string_type))
+                     for k,v in obj.items()])
+    elif isinstance(obj,(list,tuple)):
+        return [convertStrings(x,convert,string_type) for x in obj]
+    return obj
+
+def decodeRequest(line):
+    """Decode a job request from a JSON line
+
+    Strings in the request are converted to byte strings using
+    textToBytes. Raises ValueError if the line isn't valid JSON, or
+    UnicodeDecodeError (a subclass of ValueError) if it isn't valid UTF-8.
+    """
+    line.decode('utf-8')
+    return convertStrings(json.loads(line),textToBytes,unicode)
+
+def encodeMessage(msg,raw=False):
+    """Encode a reply message for sending to a client
+
+    Arguments:
+      msg: dictionary with the message 'type' and associated data
+      raw: (optional) if True then encode as a 'raw' format message (see
+        bedUtilsClient), otherwise as a single JSON line (the default)
+    """
+    if not raw:
+        return json.dumps(convertStrings(msg,bytesToText,str))+'\n'
+    if msg['type'] == 'output':
+        tag = msg['stream']
+        data = msg['data']
+    elif msg['type'] == 'finished':
+        tag = 'finished'
+        data = ''.join(["exit_status %d\n" % msg['exit_status']] +
+                       ["%s %s\n" % (name,msg['stats'][name])
+                        for name in sorted(msg['stats'])])
+    else:
+        tag = msg['type']
+        data = msg['message']
+    return "%s %d\n%s" % (tag,len(data),data)
+
+def sendMessage(sock,msg,raw=False):
+    """Send a reply message over a socket
+
+    Arguments:
+      sock: connected socket object
+      msg: dictionary with the message 'type' and associated data
+      raw: (optional) if True then send as a 'raw' format message
+        (default is JSON)
+    """
+    sock.sendall(encodeMessage(msg,raw))
+
+def runJob(tool_main,argv,cwd,stdout,stderr):
+    """Run a program's main function with redirected output
+
+    The function is run in the specified working directory, with
+    sys.stdout, sys.stderr and the output of any console logging handlers
+    redirected to the supplied streams. These are restored afterwards.
+
+    Arguments:
+      tool_main: main function of the program to run
+      argv: command line to pass to the main function
+      cwd: working directory to run the program in
+      stdout: file-like object to send standard output to
+      stderr: file-like object to send standard error and logging to
+
+    Returns:
+      Exit status from the program.
+    """
+    # Redirect output
+    saved_stdout = sys.stdout
+    saved_stderr = sys.stderr
+    saved_handlers = []
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler,logging.StreamHandler) and \
+                not isinstance(handler,logging.FileHandler):
+            saved_handlers.append((handler,handler.stream))
+            handler.stream = stderr
+    sys.stdout = stdout
+    sys.stderr = stderr
+    saved_cwd = os.getcwd()
+    try:
+        os.chdir(cwd)
+        try:
+            exit_status = tool_main(argv)
+        except SystemExit, ex:
+            # Raised by optparse on errors, or for --help and --version
+            if ex.code is None:
+                exit_status = 0
+            elif isinstance(ex.code,int):
+                exit_status = ex.code
+            else:
+                stderr.write("%s\n" % ex.code)
+                exit_status = 1
+        except Exception:
+            traceback.print_exc(file=stderr)
+            exit_status = 1
+    finally:
+        stdout.flush()
+        stderr.flush()
+        os.chdir(saved_cwd)
+        sys.stdout = saved_stdout
+        sys.stderr = saved_stderr
+        for handler,stream in saved_handlers:
+            handler.stream = stream
+    if exit_status is None:
+        exit_status = 0
+    return exit_status
+
+def removeStaleSocket(socket_path):
+    """Remove an existing socket file if no server is listening on it
+
+    Only sockets owned by the current user are removed; anything else
+    at the path is left alone.
+
+    Returns True if the path is now free, False (after reporting an
+    error) if another server is already listening on it or the path
+    can't or mustn't be removed.
+    """
+    try:
+        st = os.lstat(socket_path)
+    except OSError, ex:
+        if ex.errno == errno.ENOENT:
+            return True
+        logging.error("Unable to check '%s': %s" % (socket_path,ex.strerror))
+        return False
+    if not stat.S_ISSOCK(st.st_mode):
+        logging.error("'%s' already exists and is not a socket" % socket_path)
+        return False
+    if st.st_uid != os.getuid():
+        logging.error("Socket '%s' is owned by another user" % socket_path)
+        return False
+    sock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        logging.error("Server already running on '%s'" % socket_path)
+        return False
+    except socket.error:
+        pass
+    finally:
+        sock.close()
+    try:
+        os.remove(socket_path)
+    except OSError, ex:
+        logging.error("Unable to remove existing socket '%s': %s" %
+                      (socket_path,ex.strerror))
+        return False
+    return True
+
+def makeSocketDir(socket_dir):
+    """Create a private directory for the server socket
+
+    The directory is created if it doesn't exist, and must be owned by
+    the current user with no access for anyone else.
+
+    Returns True if the directory is usable, False (after reporting an
+    error) if not.
+    """
+    try:
+        os.mkdir(socket_dir,0700)
+    except OSError, ex:
+        if ex.errno != errno.EEXIST:
+            logging.error("Unable to make directory '%s': %s" %
+                          (socket_dir,ex.strerror))
+            return False
+    st = os.lstat(socket_dir)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or \
+            stat.S_IMODE(st.st_mode) & 0077:
+        logging.error("'%s' is not a directory accessible only by the "
+                      "current user" % socket_dir)
+        return False
+    return True
+
+def describeExitStatus(status):
+    """Return a description of a process exit status from os.wait
+    """
+    if os.WIFSIGNALED(status):
+        return "killed by signal %d" % os.WTERMSIG(status)
+    return "exit status %d" % os.WEXITSTATUS(status)
+
+def runWorker(server,max_jobs=0):
+    """Accept and run jobs in a worker process
+
+    Arguments:
+      server: JobServer instance to accept connections from
+      max_jobs: (optional) if non-zero then stop after this many jobs
+    """
+    # Leave interrupts and shutdown to the parent process
+    signal.signal(signal.SIGINT,signal.SIG_IGN)
+    signal.signal(signal.SIGTERM,signal.SIG_DFL)
+    while not max_jobs or server.jobs_handled < max_jobs:
+        server.handle_request()
+
+def startWorker(server,max_jobs=0):
+    """Fork a new worker process
+
+    Returns the process id of the worker.
+    """
+    pid = os.fork()
+    if pid == 0:
+        # Worker process
+        exit_status = 0
+        try:
+            try:
+                runWorker(server,max_jobs)
+            except Exception:
+                traceback.print_exc()
+                exit_status = 1
+        finally:
+            os._exit(exit_status)
+    return pid
+
+def serve(socket_path,nworkers,max_jobs=0):
+    """Run the server with a pool of worker processes
+
+    The parent process restarts workers as they exit, until it receives
+    SIGTERM or SIGINT; it then stops the workers and removes the socket.
+
+    Arguments:
+      socket_path: path of the Unix socket to listen on
+      nworkers: number of worker processes
+      max_jobs: (optional) if non-zero then each worker is replaced after
+        running this many jobs
+    """
+    # Create the socket with permissions for this user only, so that
+    # it can't be connected to by anyone else before it is restricted
+    saved_umask = os.umask(0077)
+    try:
+        server = JobServer(socket_path)
+    finally:
+        os.umask(saved_umask)
+    workers = {}
+    running = [True]
+    def shutdown(signum,frame):
+        running[0] = False
+    signal.signal(signal.SIGTERM,shutdown)
+    signal.signal(signal.SIGINT,shutdown)
+    try:
+        for i in range(nworkers):
+            workers[startWorker(server,max_jobs)] = time.time()
+        print "Listening on %s with %d workers" % (socket_path,nworkers)
+        sys.stdout.flush()
+        while running[0]:
+            try:
+                pid,status = os.wait()
+            except OSError, ex:
+                if ex.errno == errno.EINTR:
+                    continue
+                raise
+            if pid in workers:
+                start_time = workers.pop(pid)
+                if status != 0:
+                    logging.warning("Worker %d exited unexpectedly (%s)" %
+                                    (pid,describeExitStatus(status)))
+                    if time.time() - start_time < WORKER_RESTART_INTERVAL:
+                        # Failed straight away so wait before restarting
+                        time.sleep(WORKER_RESTART_INTERVAL)
+                if running[0]:
+                    workers[startWorker(server,max_jobs)] = time.time()
+    finally:
+        print "Shutting down"
+        for pid in workers:
+            try:
+                os.kill(pid,signal.SIGTERM)
+                os.waitpid(pid,0)
+            except OSError:
+                pass
+        server.server_close()
+        os.remove(socket_path)
+
+def main(argv):
+    """Run bedUtilsServer with the supplied command line
+
+    Arguments:
+      argv: list of command line arguments, with the program name
+        as the first element (i.e. as for sys.argv)
+
+    Returns:
+      Exit status (zero for success, non-zero for failure).
+    """
+    p = optparse.OptionParser(prog=os.path.basename(argv[0]),
+                              usage="%prog [options]",
+                              version="%prog "+__version__,
+                              description=
+                              "Run a server which accepts jobs from bedUtilsClient.py over "
+                              "a local Unix socket and runs them using a pool of worker "
+                              "processes. Programs which can be run are: %s." %
+                              ', '.join(sorted(TOOLS)))
+
+    p.add_option('--socket',action='store',dest='socket_path',default=None,
+                 help="path to the Unix socket to listen on (default '%s')" %
+                 defaultSocketPath())
+    p.add_option('--workers',action='store',dest='nworkers',type='int',default=4,
+                 help="number of worker processes (default 4)")
+    p.add_option('--max-jobs',action='store',dest='max_jobs',type='int',default=0,
+                 help="replace each worker after it has run this many jobs (default "
+                 "0, i.e. never replace workers)")
+
+    # Process the command line
+    options,arguments = p.parse_args(argv[1:])
+    if len(arguments) != 0:
+        p.error("Unexpected arguments")
+    if options.nworkers < 1:
+        p.error("Number of workers must be at least 1")
+    if options.max_jobs < 0:
+        p.error("Maximum number of jobs cannot be negative")
+    socket_path = options.socket_path
+    if socket_path is None:
+        socket_path = os.environ.get('BEDUTILS_SOCKET')
+    if socket_path is None:
+        socket_path = defaultSocketPath()
+        if not makeSocketDir(os.path.dirname(socket_path)):
+            return 1
+
+    # Report version
+    p.print_version()
+
+    # Check for another server
+    if not removeStaleSocket(socket_path):
+        return 1
+
+    # Run the server
+    try:
+        serve(socket_path,options.nworkers,options.max_jobs)
+    except socket.error, ex:
+        logging.error("Unable to listen on '%s': %s" % (socket_path,ex))
+        return 1
+    return 0
+
+#######################################################################
+# Main program
+#######################################################################
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
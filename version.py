@@ -1,2 +1,2 @@
 # Version information to be shared by all programs in this package
-__version__ = "0.1.3"
+__version__ = "0.2.0"